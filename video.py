@@ -1,18 +1,25 @@
 # coding: utf-8
 import sys
 import cv2
-import json
 import os
+import logging
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from PySide6.QtWidgets import (
     QApplication, QDialog, QFileDialog, QFormLayout, QHBoxLayout, QLabel,
     QLineEdit, QMainWindow, QMessageBox, QPushButton, QSizePolicy, QSpinBox,
-    QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget, QHeaderView
+    QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget, QHeaderView, QCheckBox
 )
-from PySide6.QtCore import QThread, Signal, Qt, QMutex, QWaitCondition
-from PySide6.QtGui import QImage, QPixmap, QFont
+from PySide6.QtCore import QThread, Signal, Qt
+from PySide6.QtGui import QFont
+
+from videocore import VideoThread, VideoWidget, load_json, save_json_atomic, set_state, setup_logging
+
+# format pesan lazy (%s): tidak diformat sama sekali bila level difilter
+logger = logging.getLogger("fall.api")
 
 
 MODERN_STYLE = """
@@ -32,94 +39,91 @@ QLineEdit, QSpinBox {
     color: #ffffff; 
 }
 QLineEdit:focus, QSpinBox:focus { border: 2px solid #00d4ff; }
+QDialog QLineEdit { border: 1px solid #0f3460; }
 QLabel#titleLabel { font-size: 22px; color: #00d4ff; font-weight: bold; }
 QLabel#statusLabel { font-weight: bold; }
-#videoFrame { background: black; border: 2px solid #00d4ff; border-radius: 8px; }
+QLabel[state="muted"] { color: #aaa; }
+QLabel[state="info"] { color: #00d4ff; }
+QLabel[state="ok"] { color: #00ff00; }
+QLabel[state="warn"] { color: #ffd32a; }
+QLabel[state="error"] { color: #ff4757; }
 """
 
 
-class VideoThread(QThread):
-    change_pixmap = Signal(QImage)
-    update_time = Signal(str)
-    fall_detected = Signal()
-    finished = Signal()
+# Batas baris riwayat yang diambil & ditampilkan sekaligus
+HISTORY_LIMIT = 500
+
 
-    def __init__(self, video_path, fall_time_sec, start_frame=0, fall_already_triggered=False):
+class ApiHealthThread(QThread):
+    # (state, detail): state = "ok" | "error" | "down"
+    result = Signal(str, str)
+
+    def __init__(self, session, base_url):
         super().__init__()
-        self.video_path = video_path
-        self.fall_time_sec = fall_time_sec
-        self._stop = False
-        self._paused = False
-        self._mutex = QMutex()
-        self._pause_cond = QWaitCondition()
-        self.start_frame = start_frame
-        self.current_frame = start_frame
-        self.fall_triggered = fall_already_triggered
+        self.session = session
+        self.base_url = base_url
 
     def run(self):
-        cap = cv2.VideoCapture(self.video_path)
-        if not cap.isOpened():
-            self.finished.emit()
-            return
+        # DNS + connect bisa memblok beberapa detik, jadi jangan di GUI thread
+        try:
+            response = self.session.get(f"{self.base_url}/health", timeout=5)
+            state = "ok" if response.status_code == 200 else "error"
+            self.result.emit(state, f"HTTP {response.status_code}")
+        except Exception as e:
+            self.result.emit("down", str(e))
+
+
+def event_order(event):
+    # urutan riwayat: id server (naik terus); id tidak valid ditaruh paling akhir
+    try:
+        return int(event.get("id"))
+    except (TypeError, ValueError):
+        return -1
+
+
+class HistoryFetchThread(QThread):
+    # (events, total diterima, error): error kosong jika sukses
+    result = Signal(object, int, str)
+
+    def __init__(self, session, base_url):
+        super().__init__()
+        self.session = session
+        self.base_url = base_url
+
+    def run(self):
+        try:
+            url = f"{self.base_url}/fall-events"
+            response = self.session.get(url, params={"limit": HISTORY_LIMIT}, timeout=10)
+            if response.status_code != 200:
+                raise Exception("Failed to fetch history")
+            events = response.json()
+            # server lama mengabaikan ?limit dan urutannya tidak dijamin: urutkan
+            # terbaru dulu sebelum dipotong, supaya yang terbuang adalah yang lama
+            events.sort(key=event_order, reverse=True)
+            self.result.emit(events[:HISTORY_LIMIT], len(events), "")
+        except Exception as e:
+            self.result.emit([], 0, str(e))
+
+
+class FallPostThread(QThread):
+    # error kosong jika event tersimpan (HTTP 201)
+    result = Signal(str)
+
+    def __init__(self, session, base_url, data):
+        super().__init__()
+        self.session = session
+        self.base_url = base_url
+        self.data = data
 
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 1
-        cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
-        self.current_frame = self.start_frame
-
-        while cap.isOpened():
-            self._mutex.lock()
-            while self._paused and not self._stop:
-                self._pause_cond.wait(self._mutex)
-            should_stop = self._stop
-            self._mutex.unlock()
-            if should_stop:
-                break
-
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            current_time = self.current_frame / fps
-            total_time = total_frames / fps
-            cur = f"{int(current_time//60):02}:{int(current_time%60):02}"
-            tot = f"{int(total_time//60):02}:{int(total_time%60):02}"
-            self.update_time.emit(f"{cur} / {tot}")
-
-            if (not self.fall_triggered) and current_time >= self.fall_time_sec:
-                self.fall_detected.emit()
-                self.fall_triggered = True
-
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb.shape
-            qt_img = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
-            self.change_pixmap.emit(qt_img)
-
-            self.current_frame += 1
-            self.msleep(max(1, int(1000 / fps)))
-
-        cap.release()
-        self.finished.emit()
-
-    def stop(self):
-        self._mutex.lock()
-        self._stop = True
-        self._paused = False
-        self._pause_cond.wakeAll()
-        self._mutex.unlock()
-
-    def toggle_pause(self):
-        self._mutex.lock()
-        self._paused = not self._paused
-        if not self._paused:
-            self._pause_cond.wakeAll()
-        self._mutex.unlock()
-
-    def is_paused(self):
-        self._mutex.lock()
-        p = self._paused
-        self._mutex.unlock()
-        return p
+    def run(self):
+        try:
+            response = self.session.post(f"{self.base_url}/fall-events", json=self.data, timeout=10)
+            if response.status_code == 201:
+                self.result.emit("")
+            else:
+                self.result.emit(response.json().get("error", "Unknown API error"))
+        except Exception as e:
+            self.result.emit(str(e))
 
 
 class FallAlarmTester(QMainWindow):
@@ -127,16 +131,20 @@ class FallAlarmTester(QMainWindow):
         super().__init__()
         self.setWindowTitle("Fall Detection System")
         self.resize(1000, 850)
-        self.setStyleSheet(MODERN_STYLE)
 
         self.video_path = None
         self.video_thread = None
         self.api_config = self.load_api_config()
         self.patient_data = self.load_patient_config()
+        # satu session untuk semua request API (koneksi keep-alive dipakai ulang)
+        self.http = self.create_http_session()
+        self.api_health_thread = None
+        self.history_thread = None
+        self.fall_post_thread = None
+        self.pending_falls = []   # payload event yang menunggu POST sebelumnya selesai
 
         self.last_frame = 0
         self.fall_triggered = False
-        self.current_time_str = "00:00"
 
         self.init_ui()
 
@@ -144,18 +152,7 @@ class FallAlarmTester(QMainWindow):
     def load_api_config(self):
         config_file = "api_config.json"
         default = {"api_base_url": "http://127.0.0.1:5000"}
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                for k, v in default.items():
-                    data.setdefault(k, v)
-                return data
-            except:
-                pass
-        with open(config_file, "w", encoding="utf-8") as f:
-            json.dump(default, f, indent=4)
-        return default
+        return load_json(config_file, default)
 
     def load_patient_config(self):
         config_file = "patient_config.json"
@@ -170,31 +167,37 @@ class FallAlarmTester(QMainWindow):
             "diastolik": 80,
             "tinggi_badan_cm": 170.0,
         }
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                # Gabungkan dengan default untuk hindari missing key
-                for k, v in default.items():
-                    data.setdefault(k, v)
-                return data
-            except:
-                return default
-        with open(config_file, "w", encoding="utf-8") as f:
-            json.dump(default, f, indent=4)
-        return default
+        return load_json(config_file, default)
 
     def save_api_config(self, base_url):
-        self.api_config = {"api_base_url": base_url}
-        with open("api_config.json", "w", encoding="utf-8") as f:
-            json.dump(self.api_config, f, indent=4)
+        config = {"api_base_url": base_url}
+        # isi sama dengan yang sudah tersimpan: tidak perlu tulis ulang file
+        if config == self.api_config:
+            return
+        self.api_config = config
+        save_json_atomic("api_config.json", self.api_config)
 
     def save_patient_config(self, data):
+        if data == self.patient_data:
+            return
         # Simpan ke file
-        with open("patient_config.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+        save_json_atomic("patient_config.json", data)
         self.patient_data = data
 
+    def create_http_session(self):
+        # Pool koneksi kecil; hanya kegagalan connect yang diulang (sekali, tanpa
+        # backoff). Read timeout / status tidak diulang supaya batas waktu tetap
+        # sama dengan timeout request, dan POST tidak pernah terkirim dua kali.
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=3,
+            max_retries=Retry(total=1, connect=1, read=0, status=0),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
     # ─── UI ─────────────────────────────────────────────────────────
     def init_ui(self):
         central = QWidget()
@@ -211,14 +214,15 @@ class FallAlarmTester(QMainWindow):
         self.api_status.setObjectName("statusLabel")
         api_row.addWidget(QPushButton("⚙️ API Config", clicked=self.open_api_config_dialog))
         api_row.addWidget(QPushButton("📋 Patient Data", clicked=self.open_patient_dialog))
-        api_row.addWidget(QPushButton("🔍 Test API", clicked=self.test_api_connection))
+        self.test_api_btn = QPushButton("🔍 Test API", clicked=self.test_api_connection)
+        api_row.addWidget(self.test_api_btn)
         api_row.addWidget(self.api_status)
         layout.addLayout(api_row)
 
         vid_row = QHBoxLayout()
         vid_row.addWidget(QPushButton("📁 Select Video", clicked=self.select_video))
         self.vid_label = QLabel("No video selected")
-        self.vid_label.setStyleSheet("color: #aaa;")
+        set_state(self.vid_label, "muted")
         vid_row.addWidget(self.vid_label)
         layout.addLayout(vid_row)
 
@@ -230,6 +234,10 @@ class FallAlarmTester(QMainWindow):
         time_row.addWidget(QLabel(":"))
         time_row.addWidget(self.sec_spin)
         time_row.addStretch()
+        self.preview_check = QCheckBox("Preview playback")
+        self.preview_check.setChecked(True)
+        self.preview_check.setToolTip("Uncheck to jump straight to the event time")
+        time_row.addWidget(self.preview_check)
         layout.addLayout(time_row)
 
         btn_row = QHBoxLayout()
@@ -248,12 +256,11 @@ class FallAlarmTester(QMainWindow):
         btn_row.addWidget(self.stop_btn)
         layout.addLayout(btn_row)
 
-        self.video_display = QLabel()
-        self.video_display.setObjectName("videoFrame")
+        self.video_display = VideoWidget()
         self.video_display.setMinimumSize(400, 300)
         self.video_display.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.video_display.setAlignment(Qt.AlignCenter)
         self.video_display.mousePressEvent = self.on_video_clicked
+        self.video_display.resized.connect(self.on_video_display_resized)
         layout.addWidget(self.video_display)
 
         self.time_label = QLabel("00:00 / 00:00")
@@ -262,7 +269,12 @@ class FallAlarmTester(QMainWindow):
         layout.addWidget(self.time_label)
         layout.addWidget(self.status_label)
 
-        layout.addWidget(QPushButton("View History", clicked=self.show_history))
+        self.history_btn = QPushButton("View History", clicked=self.show_history)
+        layout.addWidget(self.history_btn)
+
+    def on_video_display_resized(self, w, h):
+        if self.video_thread:
+            self.video_thread.set_display_size(w, h)
 
     def on_video_clicked(self, event):
         if event.button() == Qt.LeftButton:
@@ -275,21 +287,19 @@ class FallAlarmTester(QMainWindow):
         if self.video_thread.is_paused():
             self.pause_btn.setText("▶️ RESUME")
             self.status_label.setText("⏸️ Paused")
-            self.status_label.setStyleSheet("color: #ffd32a;")
+            set_state(self.status_label, "warn")
         else:
             self.pause_btn.setText("⏸️ PAUSE")
             self.status_label.setText("▶️ Monitoring...")
-            self.status_label.setStyleSheet("color: #00d4ff;")
+            set_state(self.status_label, "info")
 
     # ─── DIALOG: API CONFIG ─────────────────────────────────────────
     def open_api_config_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("API Configuration")
-        dialog.setStyleSheet(MODERN_STYLE)
         layout = QVBoxLayout()
         url_label = QLabel("API Base URL (e.g., http://10.0.1.200:5000):")
         url_input = QLineEdit(self.api_config["api_base_url"])
-        url_input.setStyleSheet("background: #1a1a2e; color: white; border: 1px solid #0f3460;")
         layout.addWidget(url_label)
         layout.addWidget(url_input)
         save_btn = QPushButton("💾 Save")
@@ -307,25 +317,33 @@ class FallAlarmTester(QMainWindow):
         QMessageBox.information(self, "Success", "API config saved!")
 
     def test_api_connection(self):
-        try:
-            url = f"{self.api_config['api_base_url']}/health"
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                self.api_status.setText("🟢 API: Connected")
-                self.api_status.setStyleSheet("color: #00ff00;")
-            else:
-                self.api_status.setText("🔴 API: Error")
-                self.api_status.setStyleSheet("color: #ff4757;")
-        except Exception as e:
+        if self.api_health_thread and self.api_health_thread.isRunning():
+            return
+        self.test_api_btn.setEnabled(False)
+        self.api_status.setText("⏳ API: Testing...")
+        set_state(self.api_status, "warn")
+
+        self.api_health_thread = ApiHealthThread(self.http, self.api_config["api_base_url"])
+        self.api_health_thread.result.connect(self.on_api_health_result)
+        self.api_health_thread.start()
+
+    def on_api_health_result(self, state, detail):
+        self.test_api_btn.setEnabled(True)
+        if state == "ok":
+            self.api_status.setText("🟢 API: Connected")
+            set_state(self.api_status, "ok")
+        elif state == "error":
+            self.api_status.setText("🔴 API: Error")
+            set_state(self.api_status, "error")
+        else:
             self.api_status.setText("🔴 API: Disconnected")
-            self.api_status.setStyleSheet("color: #ff4757;")
-            print(f"[API ERROR] {e}")
+            set_state(self.api_status, "error")
+            logger.error("Health check failed: %s", detail)
 
     # ─── DIALOG: PATIENT DATA ───────────────────────────────────────
     def open_patient_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Patient Data (EMR)")
-        dialog.setStyleSheet(MODERN_STYLE)
         form = QFormLayout()
 
         fields = [
@@ -344,7 +362,6 @@ class FallAlarmTester(QMainWindow):
         for label, key, _ in fields:
             value = self.patient_data.get(key, "")
             le = QLineEdit(str(value))
-            le.setStyleSheet("background: #1a1a2e; color: white; border: 1px solid #0f3460;")
             form.addRow(label, le)
             inputs[key] = le
 
@@ -379,7 +396,7 @@ class FallAlarmTester(QMainWindow):
         if path:
             self.video_path = path
             self.vid_label.setText(os.path.basename(path))
-            self.vid_label.setStyleSheet("color: #00d4ff;")
+            set_state(self.vid_label, "info")
 
     def start_video(self):
         if not self.video_path:
@@ -391,28 +408,32 @@ class FallAlarmTester(QMainWindow):
                 self.pause_btn.setText("⏸️ PAUSE")
             return
 
-        self.start_btn.setEnabled(False)
-        self.pause_btn.setEnabled(True)
-        self.stop_btn.setEnabled(True)
-        self.status_label.setText("▶️ Monitoring...")
-        self.status_label.setStyleSheet("color: #00d4ff;")
-
         total_sec = self.min_spin.value() * 60 + self.sec_spin.value()
         self.video_thread = VideoThread(
             self.video_path, total_sec,
             start_frame=self.last_frame,
             fall_already_triggered=self.fall_triggered,
+            preview=self.preview_check.isChecked(),
         )
-        self.video_thread.change_pixmap.connect(self.update_frame)
+        self.start_btn.setEnabled(False)
+        self.pause_btn.setEnabled(True)
+        self.stop_btn.setEnabled(True)
+        self.status_label.setText("▶️ Monitoring...")
+        set_state(self.status_label, "info")
+
+        area = self.video_display.image_area()
+        self.video_thread.set_display_size(area.width(), area.height())
+        self.video_thread.frame_ready.connect(self.update_frame)
         self.video_thread.update_time.connect(self.update_time)
-        self.video_thread.fall_detected.connect(self.trigger_fall)
+        self.video_thread.fall_time_reached.connect(self.trigger_fall)
+        self.video_thread.open_failed.connect(self.on_video_open_failed)
         self.video_thread.finished.connect(self.on_video_finished)
         self.video_thread.start()
 
     def stop_video(self):
+        # stop penuh: posisi & status event direset di bawah, jadi state
+        # thread tidak perlu dibaca (dan tidak berebut dengan thread decode)
         if self.video_thread and self.video_thread.isRunning():
-            self.last_frame = self.video_thread.current_frame
-            self.fall_triggered = self.video_thread.fall_triggered
             self.video_thread.stop()
             self.video_thread.wait(1000)
 
@@ -423,9 +444,18 @@ class FallAlarmTester(QMainWindow):
         self.pause_btn.setText("⏸️ PAUSE")
         self.stop_btn.setEnabled(False)
         self.status_label.setText("⏹️ Stopped")
-        self.status_label.setStyleSheet("color: #ff4757;")
+        set_state(self.status_label, "error")
         self.time_label.setText("00:00 / 00:00")
 
+    def on_video_open_failed(self):
+        self.start_btn.setEnabled(True)
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.setText("⏸️ PAUSE")
+        self.stop_btn.setEnabled(False)
+        self.status_label.setText("Ready")
+        set_state(self.status_label, "")
+        QMessageBox.critical(self, "Error", "Cannot open the selected video!")
+
     def on_video_finished(self):
         self.last_frame = 0
         self.fall_triggered = False
@@ -433,93 +463,145 @@ class FallAlarmTester(QMainWindow):
         self.pause_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
         self.status_label.setText("✅ Complete")
-        self.status_label.setStyleSheet("color: #00ff00;")
+        set_state(self.status_label, "ok")
 
-    def update_frame(self, img):
-        pixmap = QPixmap.fromImage(img)
-        self.video_display.setPixmap(pixmap.scaled(
-            self.video_display.size(),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        ))
+    def update_frame(self):
+        img = self.video_thread.take_frame() if self.video_thread else None
+        if img is not None:
+            self.video_display.set_image(img)
 
-    def update_time(self, t):
-        self.time_label.setText(f"⏱️ {t}")
-        self.current_time_str = t.split("/")[0].strip()
+    def update_time(self, cur_sec, total_sec):
+        self.time_label.setText(
+            f"⏱️ {cur_sec//60:02}:{cur_sec%60:02} / {total_sec//60:02}:{total_sec%60:02}"
+        )
 
     # ─── API COMMUNICATION ──────────────────────────────────────────
     def trigger_fall(self):
-        try:
-            # Kirim data yang ada di patient_config.json
-            url = f"{self.api_config['api_base_url']}/fall-events"
-            response = requests.post(url, json=self.patient_data, timeout=10)
-
-            if response.status_code == 201:
-                self.status_label.setText("FALL DETECTED!")
-                self.status_label.setStyleSheet("color: #ff4757; font-weight: bold;")
-                QMessageBox.warning(self, "FALL ALERT", f"Data {self.patient_data['emr_no']} saved via API!")
-            else:
-                error_msg = response.json().get("error", "Unknown API error")
-                raise Exception(error_msg)
+        # POST di worker thread: GUI (dan antrean frame) tidak menunggu round-trip API
+        # Kirim data yang ada di patient_config.json (salinan, dialog bisa mengubahnya)
+        data = dict(self.patient_data)
+        if self.fall_post_thread and self.fall_post_thread.isRunning():
+            # POST sebelumnya masih berjalan: antrekan, dikirim saat thread selesai
+            self.pending_falls.append(data)
+            logger.warning("Fall event for %s queued (%d pending)", data["emr_no"], len(self.pending_falls))
+            self.api_status.setText(f"⏳ API: {len(self.pending_falls)} fall event(s) queued")
+            set_state(self.api_status, "warn")
+            return
+        self.start_fall_post(data)
+
+    def start_fall_post(self, data):
+        self.fall_post_thread = FallPostThread(self.http, self.api_config["api_base_url"], data)
+        self.fall_post_thread.result.connect(self.on_fall_posted)
+        self.fall_post_thread.finished.connect(self.on_fall_post_finished)
+        self.fall_post_thread.start()
+
+    def on_fall_post_finished(self):
+        # dipanggil setelah run() selesai, jadi thread lama aman diganti
+        if self.pending_falls:
+            self.start_fall_post(self.pending_falls.pop(0))
+            self.api_status.setText(f"⏳ API: Sending queued fall event ({len(self.pending_falls)} more queued)")
+            set_state(self.api_status, "warn")
+
+    def on_fall_posted(self, error):
+        if error:
+            logger.error("Fall POST failed: %s", error)
+            QMessageBox.critical(self, "API Error", f"Failed to save\n{error}")
+            return
 
-        except Exception as e:
-            print(f"[API FALL ERROR] {e}")
-            QMessageBox.critical(self, "API Error", f"Failed to save\n{str(e)}")
+        self.status_label.setText("FALL DETECTED!")
+        set_state(self.status_label, "error")
+        # non-modal: tidak membuka event loop bersarang selama video berjalan
+        box = QMessageBox(QMessageBox.Warning, "FALL ALERT",
+                          f"Data {self.fall_post_thread.data['emr_no']} saved via API!", parent=self)
+        box.setAttribute(Qt.WA_DeleteOnClose)
+        box.setModal(False)
+        box.show()
 
     def show_history(self):
-        try:
-            url = f"{self.api_config['api_base_url']}/fall-events"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200:
-                raise Exception("Failed to fetch history")
+        # fetch di worker thread; dialog dibuka setelah data tiba
+        if self.history_thread and self.history_thread.isRunning():
+            return
+        self.history_btn.setEnabled(False)
+        self.history_thread = HistoryFetchThread(self.http, self.api_config["api_base_url"])
+        self.history_thread.result.connect(self.on_history_loaded)
+        self.history_thread.start()
+
+    def on_history_loaded(self, events, total, error):
+        self.history_btn.setEnabled(True)
+        if error:
+            logger.error("History fetch failed: %s", error)
+            QMessageBox.critical(self, "Error", f"Failed to load history:\n{error}")
+            return
 
-            events = response.json()
-            
-            dialog = QDialog(self)
-            dialog.setWindowTitle("Fall Events History")
-            dialog.resize(1000, 500)
-            dialog.setStyleSheet(MODERN_STYLE)
-            layout = QVBoxLayout()
-
-            table = QTableWidget()
-            headers = ["ID", "EMR", "HR", "Resp", "Jarak(cm)", "Glukosa", "Berat(kg)", "Sis", "Dia", "Fall", "Tinggi(cm)", "BMI", "Waktu"]
-            table.setColumnCount(len(headers))
-            table.setHorizontalHeaderLabels(headers)
-            table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-
-            table.setRowCount(len(events))
-            for i, event in enumerate(events):
-                for j, key in enumerate([
-                    "id", "emr_no", "heart_rate", "respirasi", "jarak_kasur_cm", "glukosa",
-                    "berat_badan_kg", "sistolik", "diastolik", "fall_detected",
-                    "tinggi_badan_cm", "bmi", "created_at"
-                ]):
-                    val = event.get(key, "")
-                    if key == "fall_detected":
-                        display_val = "✅" if val else "❌"
-                    else:
-                        display_val = str(val) if val is not None else ""
-                    table.setItem(i, j, QTableWidgetItem(display_val))
-
-            layout.addWidget(table)
-            dialog.setLayout(layout)
-            dialog.exec()
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Fall Events History")
+        dialog.resize(1000, 500)
+        layout = QVBoxLayout()
 
-        except Exception as e:
-            print(f"[HISTORY ERROR] {e}")
-            QMessageBox.critical(self, "Error", f"Failed to load history:\n{str(e)}")
+        summary = f"Showing {len(events)} of {total} events (newest first)"
+        if total >= HISTORY_LIMIT:
+            summary += f" — limited to the latest {HISTORY_LIMIT}"
+        count_label = QLabel(summary)
+        set_state(count_label, "muted")
+        layout.addWidget(count_label)
+
+        table = QTableWidget()
+        headers = ["ID", "EMR", "HR", "Resp", "Jarak(cm)", "Glukosa", "Berat(kg)", "Sis", "Dia", "Fall", "Tinggi(cm)", "BMI", "Waktu"]
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+
+        # matikan repaint/sorting/sinyal selama pengisian agar tidak relayout per sel
+        table.setUpdatesEnabled(False)
+        table.setSortingEnabled(False)
+        table.blockSignals(True)
+        table.setRowCount(len(events))
+        for i, event in enumerate(events):
+            for j, key in enumerate([
+                "id", "emr_no", "heart_rate", "respirasi", "jarak_kasur_cm", "glukosa",
+                "berat_badan_kg", "sistolik", "diastolik", "fall_detected",
+                "tinggi_badan_cm", "bmi", "created_at"
+            ]):
+                val = event.get(key, "")
+                if key == "fall_detected":
+                    display_val = "✅" if val else "❌"
+                else:
+                    display_val = str(val) if val is not None else ""
+                table.setItem(i, j, QTableWidgetItem(display_val))
+        table.blockSignals(False)
+        table.setUpdatesEnabled(True)
+
+        layout.addWidget(table)
+        dialog.setLayout(layout)
+        dialog.exec()
 
     def closeEvent(self, e):
         if self.video_thread:
             self.video_thread.stop()
             self.video_thread.wait()
+        # jangan mulai POST antrean baru dari slot finished setelah window ditutup
+        if self.pending_falls:
+            logger.warning("Dropping %d queued fall event(s) on exit", len(self.pending_falls))
+            self.pending_falls.clear()
+        # worker harus selesai sebelum wrapper QThread-nya ikut dihapus bersama
+        # window; lamanya dibatasi timeout request (connect diulang sekali saja)
+        for t in (self.api_health_thread, self.history_thread, self.fall_post_thread):
+            if t:
+                t.wait()
+        # session ditutup setelah tidak ada request yang masih memakainya
+        self.http.close()
         e.accept()
 
 
 def main():
+    # satu-satunya operasi cv di loop adalah resize kecil; thread pool OpenCV
+    # hanya berebut core dengan decoder FFmpeg, Qt dan thread MQTT/API
+    cv2.setNumThreads(1)
+    setup_logging()
     app = QApplication(sys.argv)
     app.setFont(QFont("Segoe UI", 10))
+    # stylesheet di-parse sekali untuk seluruh aplikasi (window, dialog, message box)
+    app.setStyleSheet(MODERN_STYLE)
     window = FallAlarmTester()
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,495 @@
+# coding: utf-8
+# Komponen playback bersama untuk video.py (API) dan videomqtt.py (MQTT)
+import os
+import json
+import logging
+import cv2
+import numpy as np
+
+try:
+    import av   # PyAV, opsional: backend decode alternatif
+except ImportError:
+    av = None
+
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import QThread, Signal, Qt, QMutex, QWaitCondition, QRect, QElapsedTimer
+from PySide6.QtGui import QImage, QPainter, QPen, QColor
+
+# format pesan lazy (%s): tidak diformat sama sekali bila level difilter
+logger = logging.getLogger("fall.video")
+
+
+def setup_logging():
+    # level dari FALL_LOGLEVEL (mis. DEBUG/INFO); nilai tidak dikenal -> WARNING
+    level = getattr(logging, os.environ.get("FALL_LOGLEVEL", "WARNING").upper(), None)
+    if not isinstance(level, int):
+        level = logging.WARNING
+    logging.basicConfig(level=level, format="[%(name)s %(levelname)s] %(message)s")
+
+
+def save_json_atomic(file, data):
+    # tulis ke file sementara lalu os.replace, supaya crash saat menulis
+    # tidak meninggalkan config yang terpotong
+    tmp = f"{file}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp, file)
+
+
+def load_json(file, default):
+    # langsung open (tanpa os.path.exists): satu syscall lebih sedikit dan tidak
+    # ada jeda antara cek dan buka
+    try:
+        with open(file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("top-level JSON value is not an object")
+    except FileNotFoundError:
+        # belum ada: buat dengan nilai default
+        save_json_atomic(file, default)
+        return default
+    except ValueError as e:
+        # JSON rusak (mis. typo saat edit manual): pindahkan ke .bak sebelum
+        # default ditulis, supaya isinya tidak hilang
+        try:
+            os.replace(file, f"{file}.bak")
+        except OSError as err:
+            logger.error("%s: %s; backup failed: %s", file, e, err)
+            return default
+        logger.warning("%s: %s; moved to %s.bak", file, e, file)
+        save_json_atomic(file, default)
+        return default
+    except OSError as e:
+        # ada tapi tidak terbaca (izin, dsb.): jangan timpa file-nya
+        logger.error("%s: %s", file, e)
+        return default
+    # Gabungkan dengan default untuk hindari missing key
+    for k, v in default.items():
+        data.setdefault(k, v)
+    return data
+
+
+def set_state(widget, state):
+    # warna label diatur lewat property "state" di MODERN_STYLE; cukup polish
+    # ulang widget ini, tanpa parse stylesheet baru seperti setStyleSheet()
+    if widget.property("state") == state:
+        return
+    widget.setProperty("state", state)
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
+
+
+# Backend decode: "opencv" (default) atau "pyav" jika paket av terpasang
+VIDEO_BACKEND = os.environ.get("VIDEO_BACKEND", "opencv").lower()
+
+
+class PyAVCapture:
+    """Adapter PyAV dengan subset API cv2.VideoCapture yang dipakai VideoThread.
+
+    Decode lewat av.open().decode() dengan threading FFmpeg; konversi ke BGR
+    hanya dilakukan di read(), grab() cukup memajukan decoder.
+    """
+
+    def __init__(self, path):
+        self._container = None
+        self._current = None
+        self._pending = None
+        try:
+            self._container = av.open(path)
+            self._stream = self._container.streams.video[0]
+        except Exception as e:
+            logger.error("PyAV: %s", e)
+            if self._container:
+                self._container.close()
+            self._container = None
+            return
+        self._stream.thread_type = "AUTO"
+        self._fps = float(self._stream.average_rate or 0)
+        self._frames = self._container.decode(self._stream)
+
+    def isOpened(self):
+        return self._container is not None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self._fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if self._stream.frames:
+                return float(self._stream.frames)
+            if self._stream.duration and self._stream.time_base:
+                return float(self._stream.duration * self._stream.time_base) * self._fps
+            return 0.0
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._stream.codec_context.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._stream.codec_context.height)
+        return 0.0
+
+    def _next_frame(self):
+        # error decode/demux (file terpotong/rusak) diperlakukan sebagai EOF,
+        # supaya VideoThread.run tetap selesai normal dan emit finished
+        try:
+            return next(self._frames)
+        except StopIteration:
+            return None
+        except av.error.FFmpegError as e:
+            logger.error("PyAV: %s", e)
+            self._frames = iter(())
+            return None
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        index = int(value)
+        # pts stream bisa tidak mulai dari 0 (mis. MPEG-TS)
+        start_pts = self._stream.start_time or 0
+        time_base = self._stream.time_base
+        self._pending = None
+        try:
+            if self._fps and time_base:
+                # seek ke keyframe sebelum target, lalu decode maju sampai posisi target
+                target = index / self._fps
+                self._container.seek(start_pts + int(target / time_base), stream=self._stream)
+                self._frames = self._container.decode(self._stream)
+                target += float(start_pts * time_base)   # frame.time ikut offset start_time
+                half = 0.5 / self._fps
+                while True:
+                    frame = self._next_frame()
+                    if frame is None or frame.time is None or frame.time >= target - half:
+                        self._pending = frame
+                        break
+            else:
+                # fps tidak diketahui: tidak bisa dihitung ke timestamp, jadi
+                # decode dari awal dan buang `index` frame
+                self._container.seek(start_pts, stream=self._stream)
+                self._frames = self._container.decode(self._stream)
+                for _ in range(index):
+                    if self._next_frame() is None:
+                        break
+        except av.error.FFmpegError as e:
+            logger.error("PyAV: %s", e)
+            self._frames = iter(())
+            return False
+        return True
+
+    def grab(self):
+        if self._pending is not None:
+            self._current, self._pending = self._pending, None
+        else:
+            self._current = self._next_frame()
+        return self._current is not None
+
+    def read(self, image=None):
+        # to_ndarray selalu mengalokasi array baru; `image` diabaikan
+        if not self.grab():
+            return False, None
+        return True, self._current.to_ndarray(format="bgr24")
+
+    def release(self):
+        if self._container:
+            self._container.close()
+            self._container = None
+
+
+def open_video_capture(path):
+    if VIDEO_BACKEND == "pyav":
+        if av is None:
+            logger.warning("VIDEO_BACKEND=pyav but PyAV is not installed; using OpenCV")
+        else:
+            cap = PyAVCapture(path)
+            if cap.isOpened():
+                return cap
+            logger.warning("PyAV could not open %s; using OpenCV", path)
+
+    # Minta hardware decode (VA-API/NVDEC/D3D11) jika build OpenCV mendukung,
+    # selain itu pakai backend default
+    if hasattr(cv2, "VIDEO_ACCELERATION_ANY"):
+        cap = cv2.VideoCapture(
+            path, cv2.CAP_FFMPEG,
+            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        )
+        # sebagian driver bisa membuka stream HW tapi gagal decode frame
+        # pertama; probe dengan grab() (run() seek ulang ke start_frame)
+        if cap.isOpened() and cap.grab():
+            return cap
+        cap.release()
+    return cv2.VideoCapture(path)
+
+
+# Frame rate maksimal yang benar-benar di-decode & ditampilkan; frame sisanya
+# hanya di-grab() untuk memajukan posisi
+DISPLAY_FPS = 15
+
+# Jumlah buffer frame yang diputar. Dua sudah cukup: satu slot berisi frame
+# terakhir yang dikirim (dibaca take_frame & pembanding duplikat), decode
+# berikutnya selalu masuk ke slot lainnya
+FRAME_RING_SIZE = 2
+
+
+# =========================
+# VIDEO WIDGET
+# =========================
+class VideoWidget(QWidget):
+    """Menggambar QImage langsung dengan QPainter.
+
+    Menggantikan QLabel + QPixmap.fromImage + scaled per frame: tidak ada
+    salinan ke QPixmap dan scaling dikerjakan saat paint oleh Qt.
+    """
+
+    resized = Signal(int, int)   # ukuran area gambar (tanpa border)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # tanpa WA_OpaquePaintEvent: sudut di luar rounded rect tidak digambar,
+        # jadi background parent harus tetap dilukis Qt di belakangnya
+        self._img = None
+
+    def image_area(self):
+        return self.rect().adjusted(3, 3, -3, -3)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        area = self.image_area()
+        self.resized.emit(area.width(), area.height())
+
+    def set_image(self, img):
+        self._img = img
+        self.update()
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.setPen(QPen(QColor("#00d4ff"), 2))
+        p.setBrush(Qt.black)
+        p.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 8, 8)
+        if self._img is not None and not self._img.isNull():
+            area = self.image_area()
+            size = self._img.size().scaled(area.size(), Qt.KeepAspectRatio)
+            x = area.x() + (area.width() - size.width()) // 2
+            y = area.y() + (area.height() - size.height()) // 2
+            p.drawImage(QRect(x, y, size.width(), size.height()), self._img)
+        p.end()
+
+
+# =========================
+# VIDEO THREAD
+# =========================
+class VideoThread(QThread):
+    frame_ready = Signal()   # ada frame baru; ambil dengan take_frame()
+    update_time = Signal(int, int)   # (detik sekarang, total detik)
+    fall_time_reached = Signal()   # waktu event tercapai (bukan berarti jatuh)
+    open_failed = Signal()   # video tidak bisa dibuka; finished tidak di-emit
+    finished = Signal()
+
+    def __init__(self, video_path, fall_time_sec, start_frame=0, fall_already_triggered=False,
+                 display_fps=DISPLAY_FPS, preview=True):
+        super().__init__()
+        self.video_path = video_path
+        self.fall_time_sec = fall_time_sec
+        self.display_fps = display_fps
+        self.preview = preview
+        self._stop = False
+        self._paused = False
+        self._mutex = QMutex()
+        self._pause_cond = QWaitCondition()
+        self.start_frame = start_frame
+        self.current_frame = start_frame
+        self._ring = []
+        self._ring_idx = 0
+        self._latest = None   # frame terbaru yang belum diambil GUI
+        self._prev_slot = None   # slot ring berisi frame terakhir yang dikirim
+        self._last_sec = -1   # detik terakhir yang di-emit lewat update_time
+
+        self.src_w = 0
+        self.src_h = 0
+        self._display_size = (0, 0)
+        self._decode_buf = None
+        self.fall_triggered = fall_already_triggered
+
+    def take_frame(self):
+        # QImage dari run() menunjuk langsung ke slot ring yang nanti ditimpa
+        # decode (atau dibuang saat ring dialokasi ulang), jadi GUI mendapat
+        # salinan. Disalin selagi mutex dipegang: thread decode baru bisa
+        # menulis slot ini lagi setelah mempublikasikan frame berikutnya.
+        self._mutex.lock()
+        img = self._latest.copy() if self._latest is not None else None
+        self._latest = None
+        self._mutex.unlock()
+        return img
+
+    def set_display_size(self, w, h):
+        self._mutex.lock()
+        self._display_size = (w, h)
+        self._mutex.unlock()
+
+    def _fit_size(self, display_size):
+        # ukuran target (w, h) jika frame perlu diperkecil ke area tampilan,
+        # None jika tidak perlu (atau ukuran sumber/tampilan belum diketahui)
+        dw, dh = display_size
+        if self.src_w <= 0 or self.src_h <= 0 or dw <= 0 or dh <= 0:
+            return None
+        scale = min(dw / self.src_w, dh / self.src_h)
+        if scale >= 0.9:
+            return None
+        return max(1, int(self.src_w * scale)), max(1, int(self.src_h * scale))
+
+    def run(self):
+        # open + probe HW decode bisa lambat, jadi dilakukan di sini, bukan di GUI thread
+        cap = open_video_capture(self.video_path)
+        if not cap.isOpened():
+            cap.release()
+            self.open_failed.emit()
+            return
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        # beberapa container melaporkan fps 0 atau NaN (NaN > 0 bernilai False)
+        if not fps > 0:
+            fps = 30.0
+        total_frames = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        self.src_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.src_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # batas event dalam satuan frame: di dalam loop cukup bandingkan integer
+        fall_frame = int(round(self.fall_time_sec * fps))
+        start = self.start_frame
+        if not self.preview and not self.fall_triggered:
+            # tanpa preview: seek langsung ke waktu event, frame sebelumnya tidak di-decode
+            start = max(start, fall_frame)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        self.current_frame = start
+
+        # total durasi tidak berubah selama playback, hitung sekali saja
+        total_sec = int(total_frames / fps)
+        inv_fps = 1.0 / fps
+        # tampilkan 1 dari tiap `skip` frame; sleep mencakup semua frame yg dilewati
+        skip = max(1, int(round(fps / self.display_fps)))
+        period_ms = 1000.0 * skip / fps
+        pending_skip = 0
+
+        # pacing berbasis deadline absolut: tidak ada drift dari waktu decode/emit
+        clock = QElapsedTimer()
+        clock.start()
+        shown = 0
+        last_display_size = None
+        target = None
+
+        while cap.isOpened():
+            self._mutex.lock()
+            was_paused = self._paused
+            while self._paused and not self._stop:
+                self._pause_cond.wait(self._mutex)
+            should_stop = self._stop
+            display_size = self._display_size
+            self._mutex.unlock()
+            if should_stop:
+                break
+            if was_paused:
+                # setelah resume, jadwal dihitung ulang dari sekarang
+                clock.restart()
+                shown = 0
+
+            # frame yang tidak ditampilkan cukup di-grab() (tanpa retrieve,
+            # konversi warna, maupun QImage) untuk memajukan posisi
+            eof = False
+            for _ in range(pending_skip):
+                if not cap.grab():
+                    eof = True
+                    break
+                self.current_frame += 1
+            if eof:
+                break
+            pending_skip = skip - 1
+
+            if display_size != last_display_size:
+                last_display_size = display_size
+                target = self._fit_size(display_size)
+
+            # hasil akhir selalu berada di slot ring buffer (lihat take_frame)
+            slot = self._ring_idx
+            if target is None:
+                # decode langsung ke slot (OpenCV memakai ulang array jika ukurannya cocok)
+                ret, frame = cap.read(self._ring[slot] if self._ring else None)
+                if not ret:
+                    break
+                if not self._ring or self._ring[0].shape != frame.shape:
+                    self._ring = [np.empty_like(frame) for _ in range(FRAME_RING_SIZE)]
+                    self._prev_slot = None
+                self._ring[slot] = frame
+            else:
+                # perkecil di worker (INTER_AREA, SIMD) agar tahap berikutnya
+                # memindahkan byte sesedikit mungkin
+                ret, self._decode_buf = cap.read(self._decode_buf)
+                if not ret:
+                    break
+                tw, th = target
+                if not self._ring or self._ring[0].shape[:2] != (th, tw):
+                    self._ring = [np.empty((th, tw, 3), np.uint8) for _ in range(FRAME_RING_SIZE)]
+                    self._prev_slot = None
+                frame = self._ring[slot]
+                cv2.resize(self._decode_buf, target, dst=frame, interpolation=cv2.INTER_AREA)
+
+            cur_sec = int(self.current_frame * inv_fps)
+            # label hanya berubah tiap detik, jadi emit hanya saat detik berganti
+            if cur_sec != self._last_sec:
+                self._last_sec = cur_sec
+                self.update_time.emit(cur_sec, total_sec)
+
+            # Saat waktu event tercapai, emit sekali saja
+            if (not self.fall_triggered) and self.current_frame >= fall_frame:
+                self.fall_time_reached.emit()
+                self.fall_triggered = True
+
+            # segmen statis: frame yang sama dengan sebelumnya tidak dikirim
+            # ulang, dan slot ring-nya dipakai lagi untuk decode berikutnya
+            # dibandingkan penuh (bukan sampel piksel) supaya perubahan kecil
+            # seperti overlay jam tetap terkirim; cv2.norm NORM_INF tidak
+            # mengalokasi array sementara seperti np.array_equal
+            prev = self._prev_slot
+            if prev is None or cv2.norm(frame, self._ring[prev], cv2.NORM_INF) != 0:
+                self._prev_slot = slot
+                self._ring_idx = (slot + 1) % FRAME_RING_SIZE
+
+                # Format_BGR888 membaca urutan byte OpenCV apa adanya, tanpa cvtColor
+                h, w, _ = frame.shape
+                qt_img = QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+                # conflation: jika GUI belum mengambil frame sebelumnya, cukup ganti
+                # isinya; antrean event tidak pernah berisi lebih dari satu notifikasi
+                self._mutex.lock()
+                notify = self._latest is None
+                self._latest = qt_img
+                self._mutex.unlock()
+                if notify:
+                    self.frame_ready.emit()
+
+            self.current_frame += 1
+
+            shown += 1
+            delay = int(shown * period_ms) - clock.elapsed()
+            if delay > 0:
+                self.msleep(delay)
+            elif -delay >= period_ms:
+                # tertinggal >= 1 periode: lewati frame (grab saja) daripada melambat
+                lag = int(-delay // period_ms)
+                pending_skip += lag * skip
+                shown += lag
+
+        cap.release()
+        self.finished.emit()
+
+    def stop(self):
+        self._mutex.lock()
+        self._stop = True
+        self._paused = False
+        self._pause_cond.wakeAll()
+        self._mutex.unlock()
+
+    def toggle_pause(self):
+        self._mutex.lock()
+        self._paused = not self._paused
+        if not self._paused:
+            self._pause_cond.wakeAll()
+        self._mutex.unlock()
+
+    def is_paused(self):
+        self._mutex.lock()
+        p = self._paused
+        self._mutex.unlock()
+        return p
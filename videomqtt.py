@@ -1,19 +1,26 @@
 import sys
 import cv2
 import json
+import logging
 import os
+import socket
 from datetime import datetime, timezone
 
 from PySide6.QtWidgets import (
     QApplication, QDialog, QFileDialog, QFormLayout, QHBoxLayout, QLabel,
     QLineEdit, QMainWindow, QMessageBox, QPushButton, QSizePolicy, QSpinBox,
-    QVBoxLayout, QWidget, QComboBox
+    QVBoxLayout, QWidget, QComboBox, QCheckBox, QPlainTextEdit
 )
-from PySide6.QtCore import QThread, Signal, Qt, QMutex, QWaitCondition
-from PySide6.QtGui import QImage, QPixmap, QFont
+from PySide6.QtCore import Signal, Qt
+from PySide6.QtGui import QFont
 
 import paho.mqtt.client as mqtt
 
+from videocore import VideoThread, VideoWidget, load_json, save_json_atomic, set_state, setup_logging
+
+# format pesan lazy (%s): tidak diformat sama sekali bila level difilter
+logger = logging.getLogger("fall.mqtt")
+
 
 MODERN_STYLE = """
 QMainWindow { background: #1a1a2e; }
@@ -32,113 +39,32 @@ QLineEdit, QSpinBox, QComboBox {
     color: #ffffff;
 }
 QLineEdit:focus, QSpinBox:focus, QComboBox:focus { border: 2px solid #00d4ff; }
+QDialog QLineEdit, QDialog QComboBox { border: 1px solid #0f3460; }
 QLabel#titleLabel { font-size: 22px; color: #00d4ff; font-weight: bold; }
 QLabel#statusLabel { font-weight: bold; }
-#videoFrame { background: black; border: 2px solid #00d4ff; border-radius: 8px; }
+QLabel[state="muted"] { color: #aaa; }
+QLabel[state="info"] { color: #00d4ff; }
+QLabel[state="ok"] { color: #00ff00; }
+QLabel[state="warn"] { color: #ffd32a; }
+QLabel[state="error"] { color: #ff4757; }
 """
 
 
-# =========================
-# VIDEO THREAD
-# =========================
-class VideoThread(QThread):
-    change_pixmap = Signal(QImage)
-    update_time = Signal(str)
-    fall_time_reached = Signal()   # <-- sinyal saat waktu jatuh tercapai (bukan berarti jatuh)
-    finished = Signal()
-
-    def __init__(self, video_path, fall_time_sec, start_frame=0, already_emitted=False):
-        super().__init__()
-        self.video_path = video_path
-        self.fall_time_sec = fall_time_sec
-        self._stop = False
-        self._paused = False
-        self._mutex = QMutex()
-        self._pause_cond = QWaitCondition()
-        self.start_frame = start_frame
-        self.current_frame = start_frame
-        self._event_emitted = already_emitted
-
-    def run(self):
-        cap = cv2.VideoCapture(self.video_path)
-        if not cap.isOpened():
-            self.finished.emit()
-            return
-
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 1
-        cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
-        self.current_frame = self.start_frame
-
-        while cap.isOpened():
-            self._mutex.lock()
-            while self._paused and not self._stop:
-                self._pause_cond.wait(self._mutex)
-            should_stop = self._stop
-            self._mutex.unlock()
-            if should_stop:
-                break
-
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            current_time = self.current_frame / fps
-            total_time = total_frames / fps
-            cur = f"{int(current_time//60):02}:{int(current_time%60):02}"
-            tot = f"{int(total_time//60):02}:{int(total_time%60):02}"
-            self.update_time.emit(f"{cur} / {tot}")
-
-            # Saat waktu event tercapai, emit sekali saja
-            if (not self._event_emitted) and (current_time >= self.fall_time_sec):
-                self.fall_time_reached.emit()
-                self._event_emitted = True
-
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb.shape
-            qt_img = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
-            self.change_pixmap.emit(qt_img)
-
-            self.current_frame += 1
-            self.msleep(max(1, int(1000 / fps)))
-
-        cap.release()
-        self.finished.emit()
-
-    def stop(self):
-        self._mutex.lock()
-        self._stop = True
-        self._paused = False
-        self._pause_cond.wakeAll()
-        self._mutex.unlock()
-
-    def toggle_pause(self):
-        self._mutex.lock()
-        self._paused = not self._paused
-        if not self._paused:
-            self._pause_cond.wakeAll()
-        self._mutex.unlock()
-
-    def is_paused(self):
-        self._mutex.lock()
-        p = self._paused
-        self._mutex.unlock()
-        return p
-
-    @property
-    def event_emitted(self):
-        return self._event_emitted
+# field mqtt_config yang menentukan koneksi (selain ini cukup update di memori)
+MQTT_CONN_KEYS = ("broker", "port", "username", "password")
 
 
 # =========================
 # MAIN WINDOW
 # =========================
 class FallAlarmTester(QMainWindow):
+    # (connected, teks, state) dari thread paho; diterima di GUI thread
+    mqtt_status_changed = Signal(bool, str, str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Fall Detection System")
         self.resize(1000, 850)
-        self.setStyleSheet(MODERN_STYLE)
 
         self.video_path = None
         self.video_thread = None
@@ -149,10 +75,10 @@ class FallAlarmTester(QMainWindow):
 
         self.last_frame = 0
         self.event_emitted = False  # apakah waktu jatuh sudah pernah terpanggil
-        self.current_time_str = "00:00"
 
         self.mqtt_client = None
         self.mqtt_connected = False
+        self.mqtt_status_changed.connect(self.on_mqtt_status)
 
         self.init_ui()
         self.setup_mqtt()
@@ -170,7 +96,7 @@ class FallAlarmTester(QMainWindow):
             "username": "",
             "password": ""
         }
-        return self._load_json(config_file, default)
+        return load_json(config_file, default)
 
     def load_data_config(self):
         config_file = "data_config.json"
@@ -179,7 +105,7 @@ class FallAlarmTester(QMainWindow):
             "status": "PEOPLE",
             "nilai_sensor": 0
         }
-        data = self._load_json(config_file, default)
+        data = load_json(config_file, default)
 
         # normalisasi status
         if isinstance(data.get("status"), bool):
@@ -197,24 +123,10 @@ class FallAlarmTester(QMainWindow):
             "breath_rate": 16,
             "distance": 0.0
         }
-        return self._load_json(config_file, default)
-
-    def _load_json(self, file, default):
-        if os.path.exists(file):
-            try:
-                with open(file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                for k, v in default.items():
-                    data.setdefault(k, v)
-                return data
-            except:
-                pass
-        with open(file, "w", encoding="utf-8") as f:
-            json.dump(default, f, indent=4)
-        return default
+        return load_json(config_file, default)
 
     def save_mqtt_config(self, broker, port, topic_hitam, topic_rsi, username, password):
-        self.mqtt_config = {
+        config = {
             "broker": broker,
             "port": int(port),
             "topic_hitam": topic_hitam,
@@ -222,27 +134,34 @@ class FallAlarmTester(QMainWindow):
             "username": username,
             "password": password
         }
-        with open("mqtt_config.json", "w", encoding="utf-8") as f:
-            json.dump(self.mqtt_config, f, indent=4)
+        # isi sama dengan yang sudah tersimpan: tidak perlu tulis ulang file
+        if config == self.mqtt_config:
+            return
+        self.mqtt_config = config
+        save_json_atomic("mqtt_config.json", self.mqtt_config)
 
     def save_data_config(self, room_id, status, nilai_sensor):
-        self.data_config = {
+        config = {
             "room_id": room_id,
             "status": status,
             "nilai_sensor": float(nilai_sensor)
         }
-        with open("data_config.json", "w", encoding="utf-8") as f:
-            json.dump(self.data_config, f, indent=4)
+        if config == self.data_config:
+            return
+        self.data_config = config
+        save_json_atomic("data_config.json", self.data_config)
 
     def save_rsi_config(self, device_id, heart_rate, breath_rate, distance):
-        self.rsi_config = {
+        config = {
             "device_id": device_id,
             "heart_rate": int(float(heart_rate)),
             "breath_rate": int(float(breath_rate)),
             "distance": float(distance),
         }
-        with open("rsi_config.json", "w", encoding="utf-8") as f:
-            json.dump(self.rsi_config, f, indent=4)
+        if config == self.rsi_config:
+            return
+        self.rsi_config = config
+        save_json_atomic("rsi_config.json", self.rsi_config)
 
     # -------------------------
     # MQTT SETUP + CALLBACKS
@@ -252,7 +171,7 @@ class FallAlarmTester(QMainWindow):
             try:
                 self.mqtt_client.loop_stop()
                 self.mqtt_client.disconnect()
-            except:
+            except Exception:   # client lama dibuang; kegagalan teardown diabaikan
                 pass
             self.mqtt_client = None
 
@@ -264,6 +183,14 @@ class FallAlarmTester(QMainWindow):
 
         self.mqtt_client.on_connect = self.on_mqtt_connect
         self.mqtt_client.on_disconnect = self.on_mqtt_disconnect
+        self.mqtt_client.on_connect_fail = self.on_mqtt_connect_fail
+        self.mqtt_client.on_socket_open = self.on_mqtt_socket_open
+        # koneksi tetap dipakai; jika putus, loop paho reconnect sendiri dengan
+        # backoff eksponensial 1s..5s (bukan default s/d 120s)
+        self.mqtt_client.reconnect_delay_set(min_delay=1, max_delay=5)
+        # antrean kirim dibatasi: saat broker macet publish langsung gagal
+        # (dilaporkan di UI) daripada menumpuk alert lama yang terkirim belakangan
+        self.mqtt_client.max_queued_messages_set(50)
 
         if self.mqtt_config.get("username"):
             self.mqtt_client.username_pw_set(
@@ -271,33 +198,55 @@ class FallAlarmTester(QMainWindow):
                 self.mqtt_config.get("password", "")
             )
 
+        self.mqtt_connected = False
+        self.mqtt_status.setText("🟡 MQTT: Connecting...")
+        set_state(self.mqtt_status, "warn")
         try:
-            self.mqtt_client.connect(
+            # connect_async: TCP connect dilakukan thread paho, window tidak
+            # tertahan walau broker tidak bisa dijangkau
+            self.mqtt_client.connect_async(
                 self.mqtt_config.get("broker", "localhost"),
                 int(self.mqtt_config.get("port", 1883)),
                 60
             )
             self.mqtt_client.loop_start()
         except Exception as e:
-            print(f"[MQTT ERROR] Failed to connect: {e}")
-            self.mqtt_connected = False
-            self.mqtt_status.setText("🔴 MQTT: Disconnected")
-            self.mqtt_status.setStyleSheet("color: #ff4757;")
+            logger.error("Failed to connect: %s", e)
+            self.on_mqtt_status(False, "🔴 MQTT: Disconnected", "error")
 
+    # callback paho berjalan di thread network paho: jangan sentuh widget di
+    # sini, teruskan lewat signal (queued ke GUI thread)
     def on_mqtt_connect(self, client, userdata, flags, reason_code, properties=None):
+        if client is not self.mqtt_client:
+            return
         if reason_code == 0:
-            self.mqtt_connected = True
-            self.mqtt_status.setText("🟢 MQTT: Connected")
-            self.mqtt_status.setStyleSheet("color: #00ff00;")
+            self.mqtt_status_changed.emit(True, "🟢 MQTT: Connected", "ok")
         else:
-            self.mqtt_connected = False
-            self.mqtt_status.setText(f"🔴 MQTT: Connection failed ({reason_code})")
-            self.mqtt_status.setStyleSheet("color: #ff4757;")
+            self.mqtt_status_changed.emit(False, f"🔴 MQTT: Connection failed ({reason_code})", "error")
+
+    def on_mqtt_socket_open(self, client, userdata, sock):
+        # matikan Nagle: dua PUBLISH kecil di publish_alerts langsung terkirim,
+        # tidak menunggu ACK paket sebelumnya (bisa ~40 ms dengan delayed ACK)
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except Exception as e:
+            # mis. transport websockets tidak punya setsockopt
+            logger.warning("TCP_NODELAY not set: %s", e)
+
+    def on_mqtt_connect_fail(self, client, userdata):
+        if client is not self.mqtt_client:
+            return
+        self.mqtt_status_changed.emit(False, "🔴 MQTT: Disconnected", "error")
 
     def on_mqtt_disconnect(self, client, userdata, flags, reason_code, properties=None):
-        self.mqtt_connected = False
-        self.mqtt_status.setText("🔴 MQTT: Disconnected")
-        self.mqtt_status.setStyleSheet("color: #ff4757;")
+        if client is not self.mqtt_client:
+            return
+        self.mqtt_status_changed.emit(False, "🔴 MQTT: Disconnected", "error")
+
+    def on_mqtt_status(self, connected, text, state):
+        self.mqtt_connected = connected
+        self.mqtt_status.setText(text)
+        set_state(self.mqtt_status, state)
 
     def _presence_from_status(self, status_value: str) -> bool:
         # NO_PEOPLE => False, selain itu True
@@ -317,23 +266,26 @@ class FallAlarmTester(QMainWindow):
             return False
 
         try:
-            status_value = status_override or self.data_config.get("status", "PEOPLE")
+            # semua key default sudah digabung saat load dan selalu ditulis
+            # lengkap oleh save_*, jadi cukup indexing langsung tanpa .get()
+            dc, rc, mc = self.data_config, self.rsi_config, self.mqtt_config
+            status_value = status_override or dc["status"]
             presence = self._presence_from_status(status_value)
             ts = self._now_iso()
 
             payload_hitam = {
-                "room_id": self.data_config.get("room_id", "ROOM_01"),
+                "room_id": dc["room_id"],
                 "status": status_value,
-                "nilai_sensor": self.data_config.get("nilai_sensor", 0.0),
+                "nilai_sensor": dc["nilai_sensor"],
                 "timestamp": ts
             }
 
             payload_rsi = {
-                "device_id": self.rsi_config.get("device_id", "RSI-001"),
-                "room_id": self.data_config.get("room_id", "ROOM_01"),
-                "breath_rate": self.rsi_config.get("breath_rate", 16),
-                "heart_rate": self.rsi_config.get("heart_rate", 72),
-                "distance": self.rsi_config.get("distance", 0.0),
+                "device_id": rc["device_id"],
+                "room_id": dc["room_id"],
+                "breath_rate": rc["breath_rate"],
+                "heart_rate": rc["heart_rate"],
+                "distance": rc["distance"],
                 "presence": presence,
                 "timestamp": ts
             }
@@ -342,21 +294,22 @@ class FallAlarmTester(QMainWindow):
                 payload_hitam["fall_detected"] = int(bool(fall_detected))
                 payload_rsi["fall_detected"] = int(bool(fall_detected))
 
+            # JSON ringkas (tanpa spasi setelah , dan :) supaya payload lebih kecil
             r1 = self.mqtt_client.publish(
-                self.mqtt_config.get("topic_hitam", "hitam"),
-                json.dumps(payload_hitam),
+                mc["topic_hitam"],
+                json.dumps(payload_hitam, separators=(",", ":")),
                 qos=1
             )
             r2 = self.mqtt_client.publish(
-                self.mqtt_config.get("topic_rsi", "rsi/data"),
-                json.dumps(payload_rsi),
+                mc["topic_rsi"],
+                json.dumps(payload_rsi, separators=(",", ":")),
                 qos=1
             )
 
             return (r1.rc == mqtt.MQTT_ERR_SUCCESS) and (r2.rc == mqtt.MQTT_ERR_SUCCESS)
 
         except Exception as e:
-            print(f"[MQTT ERROR] {e}")
+            logger.error("Publish failed: %s", e)
             return False
 
     # -------------------------
@@ -386,7 +339,7 @@ class FallAlarmTester(QMainWindow):
         vid_row = QHBoxLayout()
         vid_row.addWidget(QPushButton("📁 Select Video", clicked=self.select_video))
         self.vid_label = QLabel("No video selected")
-        self.vid_label.setStyleSheet("color: #aaa;")
+        set_state(self.vid_label, "muted")
         vid_row.addWidget(self.vid_label)
         layout.addLayout(vid_row)
 
@@ -398,6 +351,10 @@ class FallAlarmTester(QMainWindow):
         time_row.addWidget(QLabel(":"))
         time_row.addWidget(self.sec_spin)
         time_row.addStretch()
+        self.preview_check = QCheckBox("Preview playback")
+        self.preview_check.setChecked(True)
+        self.preview_check.setToolTip("Uncheck to jump straight to the event time")
+        time_row.addWidget(self.preview_check)
         layout.addLayout(time_row)
 
         btn_row = QHBoxLayout()
@@ -416,12 +373,11 @@ class FallAlarmTester(QMainWindow):
         btn_row.addWidget(self.stop_btn)
         layout.addLayout(btn_row)
 
-        self.video_display = QLabel()
-        self.video_display.setObjectName("videoFrame")
+        self.video_display = VideoWidget()
         self.video_display.setMinimumSize(400, 300)
         self.video_display.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.video_display.setAlignment(Qt.AlignCenter)
         self.video_display.mousePressEvent = self.on_video_clicked
+        self.video_display.resized.connect(self.on_video_display_resized)
         layout.addWidget(self.video_display)
 
         self.time_label = QLabel("00:00 / 00:00")
@@ -437,10 +393,14 @@ class FallAlarmTester(QMainWindow):
         ok = self.publish_alerts(status_override=None, fall_detected=False)
         if ok:
             self.status_label.setText("📨 Published current config (no fall).")
-            self.status_label.setStyleSheet("color: #00d4ff;")
+            set_state(self.status_label, "info")
         else:
             QMessageBox.critical(self, "MQTT Error", "Failed to publish!")
 
+    def on_video_display_resized(self, w, h):
+        if self.video_thread:
+            self.video_thread.set_display_size(w, h)
+
     def on_video_clicked(self, event):
         if event.button() == Qt.LeftButton:
             self.pause_resume_video()
@@ -452,11 +412,11 @@ class FallAlarmTester(QMainWindow):
         if self.video_thread.is_paused():
             self.pause_btn.setText("▶️ RESUME")
             self.status_label.setText("⏸️ Paused")
-            self.status_label.setStyleSheet("color: #ffd32a;")
+            set_state(self.status_label, "warn")
         else:
             self.pause_btn.setText("⏸️ PAUSE")
             self.status_label.setText("▶️ Monitoring...")
-            self.status_label.setStyleSheet("color: #00d4ff;")
+            set_state(self.status_label, "info")
 
     # -------------------------
     # CONFIG DIALOGS
@@ -464,7 +424,6 @@ class FallAlarmTester(QMainWindow):
     def open_mqtt_config_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("MQTT Configuration")
-        dialog.setStyleSheet(MODERN_STYLE)
         form = QFormLayout()
 
         broker = QLineEdit(self.mqtt_config.get("broker", "localhost"))
@@ -475,9 +434,6 @@ class FallAlarmTester(QMainWindow):
         password = QLineEdit(self.mqtt_config.get("password", ""))
         password.setEchoMode(QLineEdit.Password)
 
-        for w in (broker, port, topic_hitam, topic_rsi, username, password):
-            w.setStyleSheet("background: #1a1a2e; color: white; border: 1px solid #0f3460;")
-
         form.addRow("Broker", broker)
         form.addRow("Port", port)
         form.addRow("Topic (hitam)", topic_hitam)
@@ -495,6 +451,7 @@ class FallAlarmTester(QMainWindow):
 
     def handle_save_mqtt_config(self, dialog, broker, port, topic_hitam, topic_rsi, username, password):
         try:
+            old = self.mqtt_config
             self.save_mqtt_config(
                 broker.text().strip(),
                 port.text().strip(),
@@ -503,7 +460,11 @@ class FallAlarmTester(QMainWindow):
                 username.text().strip(),
                 password.text()
             )
-            self.reconnect_mqtt()
+            # topic dibaca saat publish; client lama tetap dipakai kecuali
+            # broker/kredensial berubah atau koneksi sedang putus
+            conn_changed = any(old.get(k) != self.mqtt_config.get(k) for k in MQTT_CONN_KEYS)
+            if conn_changed or not self.mqtt_connected:
+                self.reconnect_mqtt()
             dialog.accept()
             QMessageBox.information(self, "Success", "MQTT config saved!")
         except Exception as e:
@@ -512,7 +473,6 @@ class FallAlarmTester(QMainWindow):
     def open_data_config_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Data Configuration (hitam)")
-        dialog.setStyleSheet(MODERN_STYLE)
         form = QFormLayout()
 
         room_id = QLineEdit(self.data_config.get("room_id", "ROOM_01"))
@@ -521,10 +481,6 @@ class FallAlarmTester(QMainWindow):
         status_combo.setCurrentText(self.data_config.get("status", "PEOPLE"))
         nilai_sensor = QLineEdit(str(self.data_config.get("nilai_sensor", 0)))
 
-        room_id.setStyleSheet("background: #1a1a2e; color: white; border: 1px solid #0f3460;")
-        status_combo.setStyleSheet("background: #1a1a2e; color: white; border: 1px solid #0f3460;")
-        nilai_sensor.setStyleSheet("background: #1a1a2e; color: white; border: 1px solid #0f3460;")
-
         form.addRow("Room ID", room_id)
         form.addRow("Status", status_combo)
         form.addRow("Nilai Sensor", nilai_sensor)
@@ -552,7 +508,6 @@ class FallAlarmTester(QMainWindow):
     def open_rsi_config_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("RSI Configuration (rsi/data)")
-        dialog.setStyleSheet(MODERN_STYLE)
         form = QFormLayout()
 
         device_id = QLineEdit(str(self.rsi_config.get("device_id", "RSI-001")))
@@ -560,9 +515,6 @@ class FallAlarmTester(QMainWindow):
         breath_rate = QLineEdit(str(self.rsi_config.get("breath_rate", 16)))
         distance = QLineEdit(str(self.rsi_config.get("distance", 0.0)))
 
-        for w in (device_id, heart_rate, breath_rate, distance):
-            w.setStyleSheet("background: #1a1a2e; color: white; border: 1px solid #0f3460;")
-
         room_view = QLabel(self.data_config.get("room_id", "ROOM_01"))
         room_view.setStyleSheet("color:#00d4ff; font-weight:bold;")
 
@@ -596,7 +548,6 @@ class FallAlarmTester(QMainWindow):
         dialog = QDialog(self)
         dialog.setWindowTitle("Current Config")
         dialog.resize(520, 420)
-        dialog.setStyleSheet(MODERN_STYLE)
         layout = QVBoxLayout()
 
         all_cfg = {
@@ -604,12 +555,13 @@ class FallAlarmTester(QMainWindow):
             "data_config": self.data_config,
             "rsi_config": self.rsi_config
         }
-        text = json.dumps(all_cfg, indent=2)
-        label = QLabel(f"<pre>{text}</pre>")
-        label.setTextFormat(Qt.RichText)
-        label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        label.setStyleSheet("background: #0f3460; padding: 10px; border-radius: 5px;")
-        layout.addWidget(label)
+        # teks polos read-only: tanpa parser HTML, dan nilai config (mis. password
+        # berisi "<") tidak diinterpretasi sebagai markup
+        view = QPlainTextEdit(json.dumps(all_cfg, indent=2))
+        view.setReadOnly(True)
+        # font diatur lewat stylesheet: rule QWidget di MODERN_STYLE mengalahkan setFont()
+        view.setStyleSheet("background: #0f3460; padding: 10px; border: none; border-radius: 5px; font-family: monospace;")
+        layout.addWidget(view)
 
         dialog.setLayout(layout)
         dialog.exec()
@@ -627,7 +579,7 @@ class FallAlarmTester(QMainWindow):
         if path:
             self.video_path = path
             self.vid_label.setText(os.path.basename(path))
-            self.vid_label.setStyleSheet("color: #00d4ff;")
+            set_state(self.vid_label, "info")
 
     def start_video(self):
         if not self.video_path:
@@ -640,30 +592,34 @@ class FallAlarmTester(QMainWindow):
                 self.pause_btn.setText("⏸️ PAUSE")
             return
 
-        self.start_btn.setEnabled(False)
-        self.pause_btn.setEnabled(True)
-        self.stop_btn.setEnabled(True)
-        self.status_label.setText("▶️ Monitoring...")
-        self.status_label.setStyleSheet("color: #00d4ff;")
-
         total_sec = self.min_spin.value() * 60 + self.sec_spin.value()
 
         self.video_thread = VideoThread(
             self.video_path,
             total_sec,
             start_frame=self.last_frame,
-            already_emitted=self.event_emitted,
+            fall_already_triggered=self.event_emitted,
+            preview=self.preview_check.isChecked(),
         )
-        self.video_thread.change_pixmap.connect(self.update_frame)
+        self.start_btn.setEnabled(False)
+        self.pause_btn.setEnabled(True)
+        self.stop_btn.setEnabled(True)
+        self.status_label.setText("▶️ Monitoring...")
+        set_state(self.status_label, "info")
+
+        area = self.video_display.image_area()
+        self.video_thread.set_display_size(area.width(), area.height())
+        self.video_thread.frame_ready.connect(self.update_frame)
         self.video_thread.update_time.connect(self.update_time)
         self.video_thread.fall_time_reached.connect(self.on_event_time_reached)
+        self.video_thread.open_failed.connect(self.on_video_open_failed)
         self.video_thread.finished.connect(self.on_video_finished)
         self.video_thread.start()
 
     def stop_video(self):
+        # stop penuh: posisi & status event direset di bawah, jadi state
+        # thread tidak perlu dibaca (dan tidak berebut dengan thread decode)
         if self.video_thread and self.video_thread.isRunning():
-            self.last_frame = self.video_thread.current_frame
-            self.event_emitted = self.video_thread.event_emitted
             self.video_thread.stop()
             self.video_thread.wait(1000)
 
@@ -676,9 +632,18 @@ class FallAlarmTester(QMainWindow):
         self.pause_btn.setText("⏸️ PAUSE")
         self.stop_btn.setEnabled(False)
         self.status_label.setText("⏹️ Stopped")
-        self.status_label.setStyleSheet("color: #ff4757;")
+        set_state(self.status_label, "error")
         self.time_label.setText("00:00 / 00:00")
 
+    def on_video_open_failed(self):
+        self.start_btn.setEnabled(True)
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.setText("⏸️ PAUSE")
+        self.stop_btn.setEnabled(False)
+        self.status_label.setText("Ready")
+        set_state(self.status_label, "")
+        QMessageBox.critical(self, "Error", "Cannot open the selected video!")
+
     def on_video_finished(self):
         self.last_frame = 0
         self.event_emitted = False
@@ -686,19 +651,17 @@ class FallAlarmTester(QMainWindow):
         self.pause_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
         self.status_label.setText("✅ Complete")
-        self.status_label.setStyleSheet("color: #00ff00;")
-
-    def update_frame(self, img):
-        pixmap = QPixmap.fromImage(img)
-        self.video_display.setPixmap(pixmap.scaled(
-            self.video_display.size(),
-            Qt.KeepAspectRatio,
-            Qt.SmoothTransformation
-        ))
+        set_state(self.status_label, "ok")
+
+    def update_frame(self):
+        img = self.video_thread.take_frame() if self.video_thread else None
+        if img is not None:
+            self.video_display.set_image(img)
 
-    def update_time(self, t):
-        self.time_label.setText(f"⏱️ {t}")
-        self.current_time_str = t.split("/")[0].strip()
+    def update_time(self, cur_sec, total_sec):
+        self.time_label.setText(
+            f"⏱️ {cur_sec//60:02}:{cur_sec%60:02} / {total_sec//60:02}:{total_sec%60:02}"
+        )
 
     def on_event_time_reached(self):
         """
@@ -715,7 +678,7 @@ class FallAlarmTester(QMainWindow):
             ok = self.publish_alerts(status_override="PEOPLE_FALL", fall_detected=True)
             if ok:
                 self.status_label.setText("🚨 FALL DETECTED! (PEOPLE_FALL)")
-                self.status_label.setStyleSheet("color: #ff4757; font-weight: bold;")
+                set_state(self.status_label, "error")
                 QMessageBox.warning(self, "FALL ALERT", "🚨 FALL DETECTED! Data jatuh terkirim ke MQTT.")
             else:
                 QMessageBox.critical(self, "MQTT Error", "Failed to send FALL MQTT alerts!")
@@ -723,7 +686,7 @@ class FallAlarmTester(QMainWindow):
             ok = self.publish_alerts(status_override=status_cfg, fall_detected=False)
             if ok:
                 self.status_label.setText(f"⏱️ Event time reached (NO FALL). status={status_cfg}")
-                self.status_label.setStyleSheet("color: #ffd32a; font-weight: bold;")
+                set_state(self.status_label, "warn")
             else:
                 QMessageBox.critical(self, "MQTT Error", "Failed to publish at event time!")
 
@@ -735,14 +698,20 @@ class FallAlarmTester(QMainWindow):
             try:
                 self.mqtt_client.loop_stop()
                 self.mqtt_client.disconnect()
-            except:
+            except Exception:   # client lama dibuang; kegagalan teardown diabaikan
                 pass
         e.accept()
 
 
 def main():
+    # satu-satunya operasi cv di loop adalah resize kecil; thread pool OpenCV
+    # hanya berebut core dengan decoder FFmpeg, Qt dan thread MQTT/API
+    cv2.setNumThreads(1)
+    setup_logging()
     app = QApplication(sys.argv)
     app.setFont(QFont("Segoe UI", 10))
+    # stylesheet di-parse sekali untuk seluruh aplikasi (window, dialog, message box)
+    app.setStyleSheet(MODERN_STYLE)
     window = FallAlarmTester()
     window.show()
     sys.exit(app.exec())